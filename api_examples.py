@@ -6,6 +6,27 @@ This file demonstrates how to use DocuScope AI as a Python library
 instead of through the web interface or command line.
 """
 
+import threading
+
+_app = None
+_app_lock = threading.Lock()
+
+
+def get_app():
+    """Return a shared DocuScopeAI instance, initializing models on first use."""
+    global _app
+
+    from main import DocuScopeAI
+
+    if _app is None:
+        with _app_lock:
+            if _app is None:
+                app = DocuScopeAI()
+                if not app.initialize_models():
+                    return None
+                _app = app
+    return _app
+
 # Example 1: Basic API Usage
 def basic_api_example():
     """Basic example of using DocuScope AI programmatically."""
@@ -74,14 +95,13 @@ def batch_processing_example():
         print(f"\n📄 Processing: {file_path}")
         
         if app.load_document(file_path):
-            file_results = {}
-            
-            for question in questions:
-                result = app.ask_question(question)
-                if result:
-                    file_results[question] = result["result"]
-            
-            results[file_path] = file_results
+            # All questions go to the model in one concurrent batch
+            answers = app.ask_questions_batch(questions)
+            results[file_path] = {
+                question: result["result"]
+                for question, result in zip(questions, answers)
+                if result
+            }
         
         print(f"✅ Completed: {file_path}")
     
@@ -91,17 +111,13 @@ def batch_processing_example():
 def integration_example():
     """Show how to integrate with other Python applications."""
     
-    import pandas as pd
-    from main import DocuScopeAI
-    
     # Simulate a web application or data pipeline
-    def analyze_uploaded_file(file_path, user_question):
+    def analyze_uploaded_file(file_path, user_question, app=None):
         """Function that could be called from a web API or data pipeline."""
         
-        app = DocuScopeAI()
-        
-        # Initialize models (in production, you'd do this once)
-        if not app.initialize_models():
+        # Reuse the shared, already-initialized instance across requests
+        app = app or get_app()
+        if app is None:
             return {"error": "Failed to initialize AI models"}
         
         # Validate file
@@ -136,14 +152,14 @@ def integration_example():
 def custom_pipeline_example():
     """Create a custom analysis pipeline."""
     
-    from main import DocuScopeAI
     import json
     
     def create_document_report(file_path):
         """Generate a comprehensive report for any document."""
         
-        app = DocuScopeAI()
-        app.initialize_models()
+        app = get_app()
+        if app is None:
+            return {"document": file_path, "error": "Failed to initialize AI models"}
         app.load_document(file_path)
         
         # Predefined analysis questions
@@ -160,8 +176,8 @@ def custom_pipeline_example():
             "analysis": {}
         }
         
-        for category, question in analysis_questions.items():
-            result = app.ask_question(question)
+        answers = app.ask_questions_batch(list(analysis_questions.values()))
+        for category, result in zip(analysis_questions, answers):
             if result:
                 report["analysis"][category] = result["result"]
         
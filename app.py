@@ -1,9 +1,19 @@
+import io
+
 import streamlit as st
-from langchain_community.embeddings import OllamaEmbeddings
-from langchain_community.vectorstores import Chroma
-from langchain_community.document_loaders import CSVLoader, PyPDFLoader
-from langchain.chains import RetrievalQA
-from langchain_community.llms.ollama import Ollama
+
+from config import (
+    EMBEDDING_MODEL,
+    LLM_KEEP_ALIVE,
+    LLM_MODEL,
+    LLM_NUM_CTX,
+    LLM_NUM_GPU,
+    LLM_NUM_PREDICT,
+    LLM_NUM_THREAD,
+)
+
+# LangChain, FAISS and Numba are imported inside the functions below, only
+# once a document is uploaded, so the page itself renders immediately.
 
 # ---------------- Page Config ----------------
 st.set_page_config(page_title="DocuScope AI", page_icon="📄", layout="centered")
@@ -118,63 +128,126 @@ st.markdown(
     unsafe_allow_html=True,
 )
 
+# ---------------- Answer Rendering ----------------
+def answer_card(text):
+    """Render the answer card HTML for (possibly partial) answer text."""
+    return f"""
+        <div class="answer-card">
+            <h3>🤖 Answer</h3>
+            <p>{text}</p>
+        </div>
+        """
+
+
+# ---------------- Model & Document Cache ----------------
+@st.cache_resource(show_spinner=False)
+def initialize_models():
+    """Create the embedding and language models once per server process."""
+    from utils.llm import PooledOllamaEmbeddings, TunedOllama
+    from utils.sim import warmup
+
+    # Compile the similarity kernels now rather than on the first answer
+    warmup()
+
+    embedding = PooledOllamaEmbeddings(model=EMBEDDING_MODEL)
+    llm = TunedOllama(
+        model=LLM_MODEL,
+        keep_alive=LLM_KEEP_ALIVE,
+        num_ctx=LLM_NUM_CTX,
+        num_predict=LLM_NUM_PREDICT,
+        num_gpu=LLM_NUM_GPU,
+        num_thread=LLM_NUM_THREAD,
+    )
+    return embedding, llm
+
+
+@st.cache_resource(show_spinner=False)
+def process_document(file_hash, file_name, _file_bytes):
+    """Build the vector store for a document, memoized on its content hash."""
+    from utils.loaders import load_documents
+    from utils.vectorstore import load_or_build_index
+
+    embedding, _ = initialize_models()
+
+    def load_docs():
+        # Parse straight from memory; nothing is written to disk
+        return load_documents(io.BytesIO(_file_bytes), file_name)
+
+    # Embed docs (reuses the persisted index when this file was seen before)
+    return load_or_build_index(file_hash, embedding, load_docs)
+
+
+@st.cache_resource(show_spinner=False)
+def get_qa_chain(file_hash, k, _vectordb):
+    """Build the RAG chain for a document and retrieval depth, caching answers."""
+    from utils.chain import CachedQAChain, build_qa_chain
+
+    _, llm = initialize_models()
+    return CachedQAChain(build_qa_chain(llm, _vectordb, k=k))
+
+
+# ---------------- Retrieval Settings ----------------
+st.sidebar.markdown("### ⚙️ Retrieval")
+mode = st.sidebar.radio("Mode", ["Latency", "Quality"], horizontal=True)
+k = st.sidebar.slider(
+    "Context docs", 1, 6, 2 if mode == "Latency" else 4,
+    key=f"context_docs_{mode}",
+    help="Fewer context chunks mean a shorter prompt and faster answers.",
+)
+
 # ---------------- File Upload ----------------
 st.markdown("### 📂 Upload a CSV or PDF")
 uploaded_file = st.file_uploader("Drag & drop or browse your document", type=["csv", "pdf"])
 
 if uploaded_file is not None:
-    file_path = f"{uploaded_file.name}"
-    with open(file_path, "wb") as f:
-        f.write(uploaded_file.getbuffer())
+    from utils.chain import TokenStreamHandler
+    from utils.sim import near_duplicate_mask, snippet_key
+    from utils.vectorstore import file_sha256, source_vectors
 
-    # Load file
-    if file_path.endswith(".csv"):
-        loader = CSVLoader(file_path=file_path)
-    elif file_path.endswith(".pdf"):
-        loader = PyPDFLoader(file_path)
-    docs = loader.load()
+    file_bytes = uploaded_file.getvalue()
+    file_hash = file_sha256(file_bytes)
+    with st.spinner("📄 Processing document..."):
+        vectordb = process_document(file_hash, uploaded_file.name, file_bytes)
 
-    # Embed docs
-    embedding = OllamaEmbeddings(model="mxbai-embed-large")
-    vectordb = Chroma.from_documents(documents=docs, embedding=embedding)
-
-    # LLM
-    llm = Ollama(model="llama3.2:3b")
+    if vectordb is None:
+        st.error("❌ No content found in the document.")
+        st.stop()
 
     # RAG chain
-    qa_chain = RetrievalQA.from_chain_type(
-        llm=llm,
-        retriever=vectordb.as_retriever(),
-        return_source_documents=True
-    )
+    qa_chain = get_qa_chain(file_hash, k, vectordb)
 
     # ---------------- Query Section ----------------
     st.markdown("### 🔍 Ask Your Document")
     query = st.text_input("💬 Enter your question here:")
 
     if st.button("Ask"):
+        # Answer card, filled in token by token as the model generates
+        answer_placeholder = st.empty()
         with st.spinner("🤔 Thinking..."):
-            result = qa_chain({"query": query})
-
-            # Answer card
-            st.markdown(
-                f"""
-                <div class="answer-card">
-                    <h3>🤖 Answer</h3>
-                    <p>{result["result"]}</p>
-                </div>
-                """,
-                unsafe_allow_html=True,
+            stream = TokenStreamHandler(
+                lambda text: answer_placeholder.markdown(answer_card(text + "▌"), unsafe_allow_html=True)
             )
+            result = qa_chain.invoke(query, callbacks=[stream])
+            answer_placeholder.markdown(answer_card(result["result"]), unsafe_allow_html=True)
 
-            # Source documents
+            # Source documents (near-duplicate chunks are shown once)
             with st.expander("📑 Source Documents"):
-                seen = set()
-                for i, doc in enumerate(result["source_documents"]):
-                    snippet = doc.page_content.strip()
-                    if snippet not in seen:
+                sources = result["source_documents"]
+                snippets = [doc.page_content.strip() for doc in sources]
+                vectors = source_vectors(vectordb, sources)
+                if vectors is not None:
+                    keep = near_duplicate_mask(vectors)
+                else:
+                    seen = set()
+                    keep = []
+                    for snippet in snippets:
+                        key = snippet_key(snippet)
+                        keep.append(key not in seen)
+                        seen.add(key)
+
+                for i, snippet in enumerate(snippets):
+                    if keep[i]:
                         st.markdown(f"**Source {i+1}:** {snippet[:500]}...")
-                        seen.add(snippet)
 
 else:
     st.info("Please upload a document to get started.")
@@ -0,0 +1,81 @@
+"""
+DocuScope AI - Model Configuration
+==================================
+
+Default Ollama models shared by the web app, CLI and Python API. Each value
+can be overridden with an environment variable.
+
+Both defaults are quantized variants:
+
+- ``mxbai-embed-large-q8`` is a Q8_0 build of ``mxbai-embed-large`` (which
+  ships as FP16). It roughly halves the model's memory footprint and speeds
+  up embedding on CPU-bound hosts, with negligible retrieval-quality loss.
+  Create it once with::
+
+      ollama pull mxbai-embed-large
+      ollama create mxbai-embed-large-q8 -q q8_0 -f models/mxbai-embed-large-q8.Modelfile
+
+- ``llama3.2:3b-instruct-q4_K_M`` pins the Q4_K_M quantization of the
+  generator, which keeps answers close to FP16 quality at ~2GB.
+
+The generator is kept loaded for ``LLM_KEEP_ALIVE`` after each request so
+Ollama can reuse the KV cache of the (fixed) QA prompt prefix, with a
+context window of ``LLM_NUM_CTX`` tokens. ``LLM_NUM_CTX`` stays at 4096 rather
+than 2048 so that ``RETRIEVAL_K`` 512-token chunks plus the prompt and answer
+fit without truncation. Answers are capped at ``LLM_NUM_PREDICT`` tokens to
+stop runaway generation.
+
+By default Ollama decides how many layers to offload to CUDA/Metal from the
+free GPU memory, and falls back to CPU inference on hosts without a supported
+GPU. ``DOCUSCOPE_LLM_NUM_GPU`` overrides the layer count: ``0`` forces CPU,
+and a large value such as ``999`` forces every layer onto the GPU, which can
+fail to load if the model does not fit. Layers left on the CPU run on as many
+threads as Ollama picks; ``DOCUSCOPE_LLM_NUM_THREAD`` overrides that, and is
+best set to the number of physical (not logical/SMT) cores.
+
+Answers are generated from the ``RETRIEVAL_K`` most relevant chunks.
+
+Documents are embedded ``EMBED_BATCH_SIZE`` chunks per request to Ollama's
+``/api/embed``. 32 suits CPU and Apple MPS hosts; raise it to 128 with
+``DOCUSCOPE_EMBED_BATCH_SIZE=128`` when Ollama runs on a CUDA GPU. Chunks
+stream from the loader to the embedder, with at most ``EMBED_PARALLEL_LIMIT``
+requests in flight, so the text and vectors held in memory are bounded
+regardless of document length (the file's own bytes are still loaded whole).
+
+Answered questions are cached per document; a new question whose embedding
+has cosine similarity of at least ``SEMANTIC_CACHE_THRESHOLD`` with an earlier
+one reuses its answer. With ``DOCUSCOPE_CACHE_ADAPTIVE=1`` the threshold
+instead adapts toward an 80% hit rate, tightening up to 0.99 but never
+relaxing below its starting value. Large caches store vectors as int8 codes
+unless ``DOCUSCOPE_CACHE_QUANTIZE=0``.
+
+Batched questions are sent ``LLM_NUM_PARALLEL`` at a time, matching the
+server's ``OLLAMA_NUM_PARALLEL`` request slots.
+
+Set ``DOCUSCOPE_EMBEDDING_MODEL=mxbai-embed-large`` to use the unquantized
+embedding model instead. Vector indexes are cached per embedding model, so
+switching models never mixes vectors.
+"""
+
+import os
+
+EMBEDDING_MODEL = os.getenv("DOCUSCOPE_EMBEDDING_MODEL", "mxbai-embed-large-q8")
+LLM_MODEL = os.getenv("DOCUSCOPE_LLM_MODEL", "llama3.2:3b-instruct-q4_K_M")
+LLM_KEEP_ALIVE = os.getenv("DOCUSCOPE_LLM_KEEP_ALIVE", "30m")
+LLM_NUM_CTX = int(os.getenv("DOCUSCOPE_LLM_NUM_CTX", "4096"))
+LLM_NUM_PREDICT = int(os.getenv("DOCUSCOPE_LLM_NUM_PREDICT", "256"))
+LLM_NUM_GPU = (
+    int(os.environ["DOCUSCOPE_LLM_NUM_GPU"]) if "DOCUSCOPE_LLM_NUM_GPU" in os.environ else None
+)
+LLM_NUM_THREAD = (
+    int(os.environ["DOCUSCOPE_LLM_NUM_THREAD"])
+    if "DOCUSCOPE_LLM_NUM_THREAD" in os.environ
+    else None
+)
+RETRIEVAL_K = 4
+EMBED_BATCH_SIZE = int(os.getenv("DOCUSCOPE_EMBED_BATCH_SIZE", "32"))
+EMBED_PARALLEL_LIMIT = int(os.getenv("DOCUSCOPE_EMBED_PARALLEL_LIMIT", "4"))
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("DOCUSCOPE_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_ADAPTIVE = os.getenv("DOCUSCOPE_CACHE_ADAPTIVE", "0") != "0"
+SEMANTIC_CACHE_QUANTIZE = os.getenv("DOCUSCOPE_CACHE_QUANTIZE", "1") != "0"
+LLM_NUM_PARALLEL = int(os.getenv("OLLAMA_NUM_PARALLEL", "4"))
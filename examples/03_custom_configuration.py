@@ -5,11 +5,17 @@ This example shows how to customize DocuScope AI for different scenarios:
 - Speed optimized
 - Quality optimized  
 - Memory optimized
+
+Each preset sets the LLM's num_ctx (context window) and num_batch (prompt
+batch size) explicitly, since together they decide how much VRAM the model
+allocates. For more accurate memory estimates, start the Ollama server with
+its newer allocator:
+
+    OLLAMA_NEW_ESTIMATES=1 ollama serve
 """
 
 from main import DocuScopeAI
-from langchain_community.llms.ollama import Ollama
-from langchain_community.embeddings import OllamaEmbeddings
+from utils.llm import PooledOllamaEmbeddings, TunedOllama
 
 # ============================================================================
 # PRESET 1: Speed Optimized
@@ -28,12 +34,18 @@ def setup_speed_optimized():
     app = DocuScopeAI()
     app.initialize_models()
     
-    # Use smaller models
-    app.embedding = OllamaEmbeddings(model="bge-small-en")
-    app.llm = Ollama(model="llama3.2:1b", temperature=0.0)
+    # Use smaller models, with a small batch and context to save VRAM
+    app.embedding = PooledOllamaEmbeddings(model="bge-small-en")
+    app.llm = TunedOllama(
+        model="llama3.2:1b",
+        temperature=0.0,
+        num_batch=128,
+        num_ctx=2048,
+        num_predict=256
+    )
     
     # Retrieve fewer documents
-    app.qa_chain.retriever.search_kwargs = {"k": 2}
+    app.k = 2
     
     return app
 
@@ -54,12 +66,17 @@ def setup_quality_optimized():
     app = DocuScopeAI()
     app.initialize_models()
     
-    # Use larger models
-    app.embedding = OllamaEmbeddings(model="bge-large-en")
-    app.llm = Ollama(model="mistral", temperature=0.3)
+    # Use larger models, with room for 8 retrieved chunks in the context
+    app.embedding = PooledOllamaEmbeddings(model="bge-large-en")
+    app.llm = TunedOllama(
+        model="mistral",
+        temperature=0.3,
+        num_batch=512,
+        num_ctx=8192
+    )
     
     # Retrieve more documents for better context
-    app.qa_chain.retriever.search_kwargs = {"k": 8}
+    app.k = 8
     
     return app
 
@@ -80,7 +97,8 @@ def setup_balanced():
     app = DocuScopeAI()
     app.initialize_models()
     
-    # Uses default models (mxbai-embed-large, llama3.2:3b)
+    # Uses default models (mxbai-embed-large-q8, llama3.2:3b), with num_ctx=4096
+    app.llm.num_batch = 256
     # k=4 by default
     
     return app
@@ -98,18 +116,19 @@ def setup_custom():
     app.initialize_models()
     
     # Mix and match components
-    app.embedding = OllamaEmbeddings(model="mxbai-embed-large")
-    app.llm = Ollama(
+    app.embedding = PooledOllamaEmbeddings(model="mxbai-embed-large")
+    app.llm = TunedOllama(
         model="llama3.2:3b",
         temperature=0.5,      # Moderate creativity
-        top_p=0.9             # Diverse outputs
+        top_p=0.9,            # Diverse outputs
+        num_ctx=4096
     )
     
     # Custom retrieval settings
-    app.qa_chain.retriever.search_kwargs = {
-        "k": 5,               # Retrieve 5 documents
-        "score_threshold": 0.5  # Only high-confidence matches
-    }
+    app.k = 5                 # Retrieve 5 documents
+    # There is no score threshold: the chain's MMR retriever ignores
+    # score_threshold, which only the "similarity_score_threshold" search
+    # type applies. Lower k instead to keep weaker matches out of the prompt.
     
     return app
 
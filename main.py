@@ -6,17 +6,20 @@ A privacy-first document analysis tool that uses local AI models to provide
 intelligent insights from CSV and PDF files through an interactive CLI.
 
 Usage:
-    python main.py [file_path]
+    python main.py [--no-cache] [file_path]
 
 Author: David Osei Kumi
 License: MIT
 """
 
+import argparse
+import asyncio
 import os
 import sys
 import logging
+from collections import OrderedDict
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional, Tuple
 
 # Configure logging
 logging.basicConfig(
@@ -25,38 +28,84 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-try:
-    from langchain_community.embeddings import OllamaEmbeddings
-    from langchain_community.vectorstores import Chroma
-    from langchain_community.document_loaders import CSVLoader, PyPDFLoader
-    from langchain.chains import RetrievalQA
-    from langchain_community.llms.ollama import Ollama
-except ImportError as e:
-    print(f"❌ Missing required dependencies: {e}")
-    print("📦 Install with: pip install -r requirements.txt")
-    sys.exit(1)
+from config import (
+    EMBEDDING_MODEL,
+    LLM_KEEP_ALIVE,
+    LLM_MODEL,
+    LLM_NUM_CTX,
+    LLM_NUM_GPU,
+    LLM_NUM_PARALLEL,
+    LLM_NUM_PREDICT,
+    LLM_NUM_THREAD,
+    RETRIEVAL_K,
+)
+
+# LangChain, FAISS and friends are imported inside the methods that need
+# them, so importing this module (and printing the banner) stays fast.
+
+# Vector stores kept in memory for reattaching to recently loaded files
+COLLECTION_CACHE_SIZE = 8
 
 class DocuScopeAI:
     """Main class for DocuScope AI CLI application."""
     
-    def __init__(self):
+    __slots__ = (
+        "qa_chain",
+        "embedding",
+        "llm",
+        "k",
+        "table_path",
+        "use_cache",
+        "cache",
+        "_collection_cache",
+        "_exact_cache",
+    )
+    
+    def __init__(self, use_cache: bool = True):
         """Initialize the DocuScope AI system."""
         self.qa_chain = None
         self.embedding = None
         self.llm = None
+        self.k = RETRIEVAL_K
+        self.table_path = None
+        self.use_cache = use_cache
+        self.cache = None
+        # (path, mtime, size, embedding model) -> (content hash, vector store)
+        self._collection_cache = OrderedDict()
+        # Normalized question -> answer, for the loaded document
+        self._exact_cache = {}
         
     def initialize_models(self) -> bool:
         """Initialize the AI models."""
+        try:
+            from utils.llm import PooledOllamaEmbeddings, TunedOllama
+        except ImportError as e:
+            print(f"❌ Missing required dependencies: {e}")
+            print("📦 Install with: pip install -r requirements.txt")
+            return False
+        
         try:
             print("🔄 Initializing AI models...")
             
             # Initialize embedding model
-            self.embedding = OllamaEmbeddings(model="mxbai-embed-large")
-            print("✅ Embedding model loaded: mxbai-embed-large")
+            self.embedding = PooledOllamaEmbeddings(model=EMBEDDING_MODEL)
+            print(f"✅ Embedding model loaded: {EMBEDDING_MODEL}")
             
             # Initialize language model
-            self.llm = Ollama(model="llama3.2:3b")
-            print("✅ Language model loaded: llama3.2:3b")
+            self.llm = TunedOllama(
+                model=LLM_MODEL,
+                keep_alive=LLM_KEEP_ALIVE,
+                num_ctx=LLM_NUM_CTX,
+                num_predict=LLM_NUM_PREDICT,
+                num_gpu=LLM_NUM_GPU,
+                num_thread=LLM_NUM_THREAD
+            )
+            print(f"✅ Language model loaded: {LLM_MODEL}")
+            
+            if self.use_cache:
+                # Compile the cache's similarity kernels before the first question
+                from utils.sim import warmup
+                warmup()
             
             return True
             
@@ -65,8 +114,9 @@ class DocuScopeAI:
             print("\n🔧 Troubleshooting:")
             print("1. Ensure Ollama is running: ollama serve")
             print("2. Install required models:")
-            print("   ollama pull llama3.2:3b")
+            print(f"   ollama pull {LLM_MODEL}")
             print("   ollama pull mxbai-embed-large")
+            print("   ollama create mxbai-embed-large-q8 -q q8_0 -f models/mxbai-embed-large-q8.Modelfile")
             return False
     
     def validate_file(self, file_path: str) -> bool:
@@ -94,43 +144,61 @@ class DocuScopeAI:
     
     def load_document(self, file_path: str) -> bool:
         """Load and process a document."""
+        from utils.chain import QA_PROMPT, build_qa_chain
+        from utils.loaders import load_documents
+        from utils.cache import SemanticCache, settings_key
+        from utils.vectorstore import index_dir, load_or_build_index, path_sha256
+        
         try:
             print(f"📄 Loading document: {file_path}")
             path = Path(file_path)
             
-            # Choose appropriate loader
-            if path.suffix.lower() == ".csv":
-                loader = CSVLoader(file_path=file_path)
-            elif path.suffix.lower() == ".pdf":
-                loader = PyPDFLoader(file_path)
-            else:
+            if path.suffix.lower() not in [".csv", ".pdf"]:
                 print("❌ Unsupported file type.")
                 return False
             
-            # Load documents
-            print("🔄 Processing document content...")
-            docs = loader.load()
+            def load_docs():
+                # Stream pages/rows so embedding starts while parsing continues
+                print("🔄 Processing document content...")
+                return load_documents(path, file_path)
             
-            if not docs:
-                print("❌ No content found in the document.")
-                return False
+            # Reattach to a store loaded earlier in this process if the file is
+            # unchanged, skipping even the content hash and index read
+            stat = path.stat()
+            key = (str(path.resolve()), stat.st_mtime_ns, stat.st_size, self.embedding.model)
+            if key in self._collection_cache:
+                self._collection_cache.move_to_end(key)
+                file_hash, vectordb = self._collection_cache[key]
+            else:
+                # Reuse the persisted vector store if this content was embedded before
+                file_hash = path_sha256(path)
+                vectordb = load_or_build_index(file_hash, self.embedding, load_docs)
                 
-            print(f"✅ Loaded {len(docs)} document chunks")
-            
-            # Create vector store
-            print("🔄 Creating vector database...")
-            vectordb = Chroma.from_documents(
-                documents=docs, 
-                embedding=self.embedding
-            )
-            print("✅ Vector database created")
+                if vectordb is None:
+                    print("❌ No content found in the document.")
+                    return False
+                
+                self._collection_cache[key] = (file_hash, vectordb)
+                if len(self._collection_cache) > COLLECTION_CACHE_SIZE:
+                    self._collection_cache.popitem(last=False)
+                
+            print(f"✅ Vector database ready ({vectordb.index.ntotal} document chunks)")
             
             # Create QA chain
-            self.qa_chain = RetrievalQA.from_chain_type(
-                llm=self.llm,
-                retriever=vectordb.as_retriever(search_kwargs={"k": 4}),
-                return_source_documents=True
-            )
+            self.qa_chain = build_qa_chain(self.llm, vectordb, k=self.k)
+            # Aggregate questions about a CSV are answered straight from the table
+            self.table_path = path if path.suffix.lower() == ".csv" else None
+            # Answers are cached per document so they never leak across files
+            self._exact_cache = {}
+            self.flush_cache()
+            self.cache = None
+            if self.use_cache:
+                # Keyed on the LLM, k and prompt too, so changing any of them starts afresh
+                settings = settings_key(self.llm.model, self.k, QA_PROMPT.template)
+                cache_dir = index_dir(
+                    file_hash, f"{self.embedding.model}-{settings}", store="semantic-cache"
+                )
+                self.cache = SemanticCache(cache_dir)
             
             print("🎉 Document processed successfully!")
             return True
@@ -140,6 +208,44 @@ class DocuScopeAI:
             logger.error(f"Document loading error: {e}")
             return False
     
+    def flush_cache(self):
+        """Write answers cached since the last save to disk."""
+        if self.cache is not None:
+            self.cache.flush()
+    
+    def _lookup_precomputed(self, query: str) -> Tuple[Optional[dict], str]:
+        """Answer ``query`` from the exact cache or the table router, if possible.
+        
+        Returns the answer (or ``None``) and the query's exact-cache key.
+        Literal repeats and table aggregates skip even the query embedding.
+        """
+        from utils.chain import normalize_query
+        
+        exact_key = normalize_query(query)
+        if self.use_cache and exact_key in self._exact_cache:
+            return {**self._exact_cache[exact_key], "query": query}, exact_key
+        
+        if self.table_path is not None:
+            from utils.router import answer_aggregate
+            
+            result = answer_aggregate(query, self.table_path)
+            if result is not None:
+                return result, exact_key
+        
+        return None, exact_key
+    
+    def _lookup_semantic(self, query: str, vector: List[float]) -> Optional[dict]:
+        """Return the cached answer to a question similar to ``query``, if any."""
+        cached = self.cache.lookup(vector)
+        return None if cached is None else {**cached, "query": query}
+    
+    def _store(self, exact_key: str, vector: Optional[List[float]], result: dict):
+        """Remember a freshly generated answer in the enabled caches."""
+        if self.use_cache:
+            self._exact_cache[exact_key] = result
+        if vector is not None:
+            self.cache.add(vector, result)
+    
     def ask_question(self, query: str) -> Optional[dict]:
         """Ask a question about the document."""
         if not self.qa_chain:
@@ -147,8 +253,20 @@ class DocuScopeAI:
             return None
             
         try:
+            result, exact_key = self._lookup_precomputed(query)
+            if result is not None:
+                return result
+            
+            vector = None
+            if self.cache is not None:
+                vector = self.embedding.embed_query(query)
+                result = self._lookup_semantic(query, vector)
+                if result is not None:
+                    return result
+            
             print("🤔 Thinking...")
-            result = self.qa_chain({"query": query})
+            result = self.qa_chain.invoke({"query": query})
+            self._store(exact_key, vector, result)
             return result
             
         except Exception as e:
@@ -156,6 +274,56 @@ class DocuScopeAI:
             logger.error(f"Question processing error: {e}")
             return None
     
+    async def aask_question(self, query: str) -> Optional[dict]:
+        """Ask a question about the document without blocking the event loop."""
+        if not self.qa_chain:
+            print("❌ No document loaded. Please load a document first.")
+            return None
+            
+        try:
+            result, exact_key = self._lookup_precomputed(query)
+            if result is not None:
+                return result
+            
+            vector = None
+            if self.cache is not None:
+                vector = await self.embedding.aembed_query(query)
+                result = self._lookup_semantic(query, vector)
+                if result is not None:
+                    return result
+            
+            result = await self.qa_chain.ainvoke({"query": query})
+            self._store(exact_key, vector, result)
+            return result
+            
+        except Exception as e:
+            print(f"❌ Error processing question: {e}")
+            logger.error(f"Question processing error: {e}")
+            return None
+    
+    async def aask_questions(self, queries: List[str]) -> List[Optional[dict]]:
+        """Ask several questions concurrently, returning results in order."""
+        if not self.qa_chain:
+            print("❌ No document loaded. Please load a document first.")
+            return [None] * len(queries)
+        
+        # Match Ollama's parallel request slots so queued work is not dropped
+        semaphore = asyncio.Semaphore(LLM_NUM_PARALLEL)
+        
+        async def ask(query: str) -> Optional[dict]:
+            async with semaphore:
+                return await self.aask_question(query)
+        
+        return await asyncio.gather(*(ask(query) for query in queries))
+    
+    def ask_questions_batch(self, queries: List[str]) -> List[Optional[dict]]:
+        """Ask several questions about the document in one concurrent batch."""
+        print(f"🤔 Thinking about {len(queries)} questions...")
+        try:
+            return asyncio.run(self.aask_questions(queries))
+        finally:
+            self.flush_cache()
+    
     def interactive_session(self):
         """Run an interactive Q&A session."""
         print("\n" + "="*60)
@@ -168,6 +336,8 @@ class DocuScopeAI:
         print("   • 'Show me the top 5 items by value'")
         print("-"*60)
         
+        from utils.sim import snippet_key
+        
         while True:
             try:
                 # Get user input
@@ -197,9 +367,10 @@ class DocuScopeAI:
                         seen = set()
                         for i, doc in enumerate(result["source_documents"][:3]):
                             snippet = doc.page_content.strip()
-                            if snippet not in seen and len(snippet) > 10:
+                            key = snippet_key(snippet)
+                            if key not in seen and len(snippet) > 10:
                                 print(f"[{i+1}] {snippet[:200]}...")
-                                seen.add(snippet)
+                                seen.add(key)
                 
             except KeyboardInterrupt:
                 print("\n\n👋 Session interrupted. Goodbye!")
@@ -207,6 +378,8 @@ class DocuScopeAI:
             except EOFError:
                 print("\n\n👋 Session ended. Goodbye!")
                 break
+        
+        self.flush_cache()
 
 def print_banner():
     """Print application banner."""
@@ -221,6 +394,7 @@ def print_usage():
     print("\n📖 Usage:")
     print("  python main.py                    # Interactive file selection")
     print("  python main.py <file_path>        # Direct file processing")
+    print("  python main.py --no-cache ...     # Always query the model")
     print("\n📄 Supported formats: CSV, PDF")
 
 def get_file_path() -> Optional[str]:
@@ -249,10 +423,19 @@ def get_file_path() -> Optional[str]:
 
 def main():
     """Main application entry point."""
+    parser = argparse.ArgumentParser(description="DocuScope AI document analysis")
+    parser.add_argument("file_path", nargs="?", help="CSV or PDF file to analyze")
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="don't reuse answers to earlier, similar questions",
+    )
+    args = parser.parse_args()
+    
     print_banner()
     
     # Initialize DocuScope AI
-    app = DocuScopeAI()
+    app = DocuScopeAI(use_cache=not args.no_cache)
     
     # Initialize models
     if not app.initialize_models():
@@ -261,9 +444,9 @@ def main():
     # Get file path
     file_path = None
     
-    if len(sys.argv) > 1:
+    if args.file_path:
         # File path provided as command line argument
-        file_path = sys.argv[1]
+        file_path = args.file_path
     else:
         # Interactive file selection
         print_usage()
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from utils.cache import PCA_COMPONENTS, PCA_FIT_SIZE, QUANTIZE_FIT_SIZE, SemanticCache
+
+DIM = 1024
+
+
+def _clustered_vectors(rng, count, clusters=50, noise=0.9):
+    """Unit vectors grouped around shared topics, like real question embeddings."""
+    centers = rng.normal(size=(clusters, DIM))
+    vectors = centers[rng.integers(clusters, size=count)] + noise * rng.normal(size=(count, DIM))
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def _near_duplicate(rng, vector, cosine=0.97):
+    noise = rng.normal(size=DIM)
+    noise -= (noise @ vector) * vector
+    noise /= np.linalg.norm(noise)
+    return cosine * vector + np.sqrt(1 - cosine**2) * noise
+
+
+def _assert_hits(cache, rng, vectors):
+    for position in (0, len(vectors) // 2, len(vectors) - 1):
+        assert cache.lookup(vectors[position]) == {"result": position}
+        assert cache.lookup(_near_duplicate(rng, vectors[position])) == {"result": position}
+
+
+@pytest.mark.parametrize(
+    "count, quantize", [(PCA_FIT_SIZE + 100, False), (QUANTIZE_FIT_SIZE + 100, True)]
+)
+def test_near_duplicates_still_hit_after_pca(tmp_path, count, quantize):
+    rng = np.random.default_rng(0)
+    vectors = _clustered_vectors(rng, count)
+    cache = SemanticCache(tmp_path, threshold=0.92, enable_quantization=quantize, adaptive=False)
+    for position, vector in enumerate(vectors):
+        cache.add(vector, {"result": position})
+
+    assert cache.index.d == PCA_COMPONENTS
+    assert cache.threshold.value < 0.999
+    _assert_hits(cache, rng, vectors)
+
+    cache.flush()
+    reloaded = SemanticCache(tmp_path, threshold=0.92, enable_quantization=quantize, adaptive=False)
+    assert reloaded.threshold.value == cache.threshold.value
+    _assert_hits(reloaded, rng, vectors)
+
+
+def test_unrelated_question_misses_after_pca(tmp_path):
+    rng = np.random.default_rng(1)
+    vectors = _clustered_vectors(rng, PCA_FIT_SIZE + 100)
+    cache = SemanticCache(tmp_path, threshold=0.92, enable_quantization=False, adaptive=False)
+    for position, vector in enumerate(vectors):
+        cache.add(vector, {"result": position})
+
+    assert cache.lookup(_clustered_vectors(rng, 1)[0]) is None
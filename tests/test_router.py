@@ -0,0 +1,48 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from utils.router import answer_aggregate
+
+PIZZA_REVIEWS = Path(__file__).resolve().parent.parent / "examples" / "pizza_reviews.csv"
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "How many reviews are there total?",
+        "how many reviews",
+        "How many reviews are there in total?",
+    ],
+)
+def test_counts_whole_table(query):
+    result = answer_aggregate(query, PIZZA_REVIEWS)
+    assert result is not None
+    answer = json.loads(result["result"])
+    assert answer["operation"] == "count"
+    assert answer["value"] == 10
+    assert result["source_documents"] == []
+
+
+def test_max_over_named_column():
+    answer = json.loads(answer_aggregate("What's the highest review_id?", PIZZA_REVIEWS)["result"])
+    assert answer["operation"] == "max"
+    assert answer["value"] == 10
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "How many reviews mention vegan options?",
+        "How many times is cheese mentioned?",
+        "How many reviews have at least one complaint?",
+        "Which review mentions cheese the most?",
+        "What's the least liked thing about the pizza?",
+        "How many restaurants are there?",
+        "What's the average rating?",
+        "Summarize the reviews",
+    ],
+)
+def test_leaves_other_questions_to_the_qa_chain(query):
+    assert answer_aggregate(query, PIZZA_REVIEWS) is None
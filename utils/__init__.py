@@ -0,0 +1 @@
+"""Shared helpers for the DocuScope AI web app, CLI and Python API."""
@@ -0,0 +1,328 @@
+"""
+Semantic answer cache
+=====================
+
+Remembers answered questions by their query embedding, so a repeated or
+paraphrased question ("summarize the main points" / "give me a summary")
+returns the earlier answer from a FAISS lookup instead of running retrieval
+and the LLM again.
+
+Each document gets its own cache directory, so answers never leak between
+documents. New answers are written to disk in batches (every ``SAVE_EVERY``
+answers or ``SAVE_INTERVAL`` seconds) rather than on every question; call
+``flush`` to persist the rest, which also happens at interpreter exit.
+
+Once ``PCA_FIT_SIZE`` questions are cached, query embeddings are projected
+onto their top ``PCA_COMPONENTS`` principal directions before indexing,
+cutting the cache's memory and comparison cost (4x for 1024-dim vectors)
+while preserving paraphrase matching. Projection shifts cosine scores, so
+the threshold is re-derived at that point to split the cached questions
+into near and distinct pairs as it did before. From ``QUANTIZE_FIT_SIZE`` questions
+on, the index also stores vectors as int8 codes (a trained FAISS scalar
+quantizer), another 4x less memory and bandwidth per comparison. Retrieval
+over the document itself always uses full-precision, full-dimension vectors.
+"""
+
+import atexit
+import hashlib
+import json
+import logging
+import pickle
+import time
+import weakref
+from collections import deque
+from pathlib import Path
+from typing import Deque, List, Optional, Sequence
+
+import faiss
+import numpy as np
+
+from config import (
+    SEMANTIC_CACHE_ADAPTIVE,
+    SEMANTIC_CACHE_QUANTIZE,
+    SEMANTIC_CACHE_THRESHOLD,
+)
+from utils.sim import normalize_1d
+
+logger = logging.getLogger(__name__)
+
+PCA_COMPONENTS = 256
+PCA_FIT_SIZE = 500
+QUANTIZE_FIT_SIZE = 1024
+
+# A derived threshold this close to 1 would only ever match exact repeats
+MAX_PROJECTED_THRESHOLD = 0.999
+
+SAVE_EVERY = 16
+SAVE_INTERVAL = 30.0
+
+# Caches with answers not yet on disk are flushed when the process exits
+_open_caches: "weakref.WeakSet[SemanticCache]" = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_open_caches():
+    for cache in list(_open_caches):
+        cache.flush()
+
+
+def settings_key(*settings) -> str:
+    """Return a short, stable hash of the settings cached answers depend on."""
+    return hashlib.sha256(repr(settings).encode()).hexdigest()[:12]
+
+
+class AdaptiveThreshold:
+    """Similarity threshold that drifts toward a target cache hit rate.
+
+    Hits and misses are tracked over the last ``window`` lookups. Every
+    ``adjust_every`` lookups, a hit rate more than ``tolerance`` below
+    ``target_hit_rate`` relaxes the threshold by ``step``, and one more than
+    ``tolerance`` above tightens it, always within
+    ``[min_threshold, max_threshold]``.
+    """
+
+    def __init__(
+        self,
+        value: float = SEMANTIC_CACHE_THRESHOLD,
+        target_hit_rate: float = 0.8,
+        min_threshold: float = 0.7,
+        max_threshold: float = 0.99,
+        window: int = 200,
+        adjust_every: int = 50,
+        step: float = 0.01,
+        tolerance: float = 0.05,
+    ):
+        self.value = value
+        self.target_hit_rate = target_hit_rate
+        self.min_threshold = min_threshold
+        self.max_threshold = max_threshold
+        self.adjust_every = adjust_every
+        self.step = step
+        self.tolerance = tolerance
+        self.outcomes: Deque[bool] = deque(maxlen=window)
+        self.lookups = 0
+
+    @property
+    def hit_rate(self) -> float:
+        return sum(self.outcomes) / len(self.outcomes) if self.outcomes else 0.0
+
+    def record(self, hit: bool) -> bool:
+        """Record one lookup's outcome; return whether the threshold moved."""
+        self.outcomes.append(hit)
+        self.lookups += 1
+        if self.lookups % self.adjust_every:
+            return False
+        previous = self.value
+        if self.hit_rate < self.target_hit_rate - self.tolerance:
+            self.value = max(self.min_threshold, round(self.value - self.step, 4))
+        elif self.hit_rate > self.target_hit_rate + self.tolerance:
+            self.value = min(self.max_threshold, round(self.value + self.step, 4))
+        return self.value != previous
+
+
+class SemanticCache:
+    """Persistent nearest-neighbour cache of QA results for one document.
+
+    Query vectors are L2-normalized into an inner-product index, so a hit
+    is any earlier query whose cosine similarity reaches the threshold. With
+    ``adaptive`` set, the threshold is an ``AdaptiveThreshold`` starting at,
+    and never relaxing below, ``threshold``, persisted alongside the cache. Once the PCA projection is
+    fitted, every threshold is shifted by ``pca_offset`` into the projected
+    space.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        enable_quantization: bool = SEMANTIC_CACHE_QUANTIZE,
+        adaptive: bool = SEMANTIC_CACHE_ADAPTIVE,
+    ):
+        self.directory = Path(directory)
+        # Relaxing past the configured threshold would trade accuracy for hit rate
+        self.threshold = AdaptiveThreshold(threshold, min_threshold=threshold)
+        self.adaptive = adaptive
+        self.enable_quantization = enable_quantization
+        self.index: Optional[faiss.Index] = None
+        self.results: List[dict] = []
+        # (PCA_COMPONENTS, dim) projection, fitted once enough queries are cached
+        self.components: Optional[np.ndarray] = None
+        self.pca_offset = 0.0
+        self._unsaved = 0
+        self._saved_at = time.monotonic()
+        self._load()
+        _open_caches.add(self)
+
+    def _load(self):
+        index_path = self.directory / "index.faiss"
+        results_path = self.directory / "results.pkl"
+        components_path = self.directory / "pca.npy"
+        meta_path = self.directory / "meta.json"
+        meta = {}
+        if meta_path.exists():
+            try:
+                meta = json.loads(meta_path.read_text())
+            except ValueError as e:
+                logger.warning(f"Ignoring unreadable cache threshold {meta_path}: {e}")
+        self._load_index(index_path, results_path, components_path)
+
+        # Thresholds saved before or after the PCA fit only apply in that space
+        projected = self.components is not None
+        if projected and meta.get("projected"):
+            self._shift_threshold(float(meta.get("pca_offset", 0.0)))
+        if self.adaptive and "threshold" in meta and bool(meta.get("projected")) == projected:
+            self.threshold.value = float(meta["threshold"])
+
+    def _load_index(self, index_path: Path, results_path: Path, components_path: Path):
+        if not (index_path.exists() and results_path.exists()):
+            return
+        try:
+            index = faiss.read_index(str(index_path))
+            with open(results_path, "rb") as f:
+                results = pickle.load(f)
+            components = np.load(components_path) if components_path.exists() else None
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable semantic cache {self.directory}: {e}")
+            return
+        if index.ntotal != len(results):
+            return
+        if components is not None and components.shape[0] != index.d:
+            return
+        self.index, self.results, self.components = index, results, components
+
+    def save(self):
+        """Write the cache to its directory."""
+        if self.index is None:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        faiss.write_index(self.index, str(self.directory / "index.faiss"))
+        with open(self.directory / "results.pkl", "wb") as f:
+            pickle.dump(self.results, f)
+        if self.components is not None:
+            np.save(self.directory / "pca.npy", self.components)
+        self._save_meta()
+        self._unsaved = 0
+        self._saved_at = time.monotonic()
+
+    def flush(self):
+        """Write any answers added since the last save."""
+        if self._unsaved:
+            self.save()
+
+    def _save_meta(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        meta = {
+            "threshold": self.threshold.value,
+            "projected": self.components is not None,
+            "pca_offset": self.pca_offset,
+        }
+        (self.directory / "meta.json").write_text(json.dumps(meta))
+
+    def _shift_threshold(self, offset: float):
+        self.pca_offset += offset
+        self.threshold.value = min(1.0, self.threshold.value + offset)
+        self.threshold.min_threshold = min(1.0, self.threshold.min_threshold + offset)
+        self.threshold.max_threshold = min(1.0, self.threshold.max_threshold + offset)
+
+    def _prepare(self, vector: Sequence[float]) -> np.ndarray:
+        """Normalize (and, once fitted, project) a query vector for the index."""
+        prepared = normalize_1d(vector)
+        if self.components is not None:
+            prepared = normalize_1d(self.components @ prepared)
+        return prepared.reshape(1, -1)
+
+    def _fit_pca(self):
+        """Fit the projection on the cached vectors and re-index them with it.
+
+        The projection is an uncentered truncated SVD, which best preserves
+        inner products, but projected cosines still drift (typically upward),
+        so the threshold is re-derived from the cached vectors as well.
+        """
+        vectors = self.index.reconstruct_n(0, self.index.ntotal)
+        _, _, vt = np.linalg.svd(vectors, full_matrices=False)
+        self.components = np.ascontiguousarray(vt[:PCA_COMPONENTS], dtype=np.float32)
+
+        projected = np.ascontiguousarray(vectors @ self.components.T, dtype=np.float32)
+        faiss.normalize_L2(projected)
+        self.index = faiss.IndexFlatIP(PCA_COMPONENTS)
+        self.index.add(projected)
+
+        offset = self._projected_threshold(vectors, projected) - self.threshold.value
+        self._shift_threshold(offset)
+        logger.info(f"Semantic cache threshold is {self.threshold.value:.4f} after PCA")
+
+    def _projected_threshold(self, vectors: np.ndarray, projected: np.ndarray) -> float:
+        """Return the projected-space cosine equivalent to ``threshold``.
+
+        The fraction of cached pairs at or above the full-dimension threshold
+        is matched to the same quantile of projected cosines. Cached questions
+        mostly missed one another, so when no pair (or every pair) reaches the
+        threshold it is instead mapped through a line fitted to the closest
+        1% of pairs and pinned at (1, 1), since identical questions stay
+        identical after projection. A result too close to 1 to ever match a
+        paraphrase keeps the configured threshold.
+        """
+        pairs = np.triu_indices(len(vectors), k=1)
+        full = (vectors @ vectors.T)[pairs]
+        reduced = (projected @ projected.T)[pairs]
+        hit_fraction = float(np.mean(full >= self.threshold.value))
+        if 0.0 < hit_fraction < 1.0:
+            mapped = float(np.quantile(reduced, 1.0 - hit_fraction))
+        else:
+            closest = np.argsort(full)[-max(2, len(full) // 100):]
+            full_gap, reduced_gap = 1.0 - full[closest], 1.0 - reduced[closest]
+            slope = float(full_gap @ reduced_gap) / max(float(full_gap @ full_gap), 1e-12)
+            mapped = 1.0 - slope * (1.0 - self.threshold.value)
+        if not -1.0 <= mapped < MAX_PROJECTED_THRESHOLD:
+            return self.threshold.value
+        return mapped
+
+    def _quantize(self):
+        """Replace the float index with an int8 one trained on its vectors."""
+        vectors = self.index.reconstruct_n(0, self.index.ntotal)
+        index = faiss.IndexScalarQuantizer(
+            self.index.d, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_INNER_PRODUCT
+        )
+        index.train(vectors)
+        index.add(vectors)
+        self.index = index
+
+    def lookup(self, vector: Sequence[float]) -> Optional[dict]:
+        """Return the cached result of the closest earlier query, if close enough."""
+        result = None
+        if self.index is not None and self.index.ntotal > 0:
+            scores, positions = self.index.search(self._prepare(vector), 1)
+            if positions[0, 0] >= 0 and scores[0, 0] >= self.threshold.value:
+                result = self.results[positions[0, 0]]
+        if self.adaptive and self.threshold.record(result is not None):
+            self._save_meta()
+        return result
+
+    def add(self, vector: Sequence[float], result: dict):
+        """Cache ``result`` under its query embedding.
+
+        The cache is saved every ``SAVE_EVERY`` additions or ``SAVE_INTERVAL``
+        seconds, whichever comes first.
+        """
+        matrix = self._prepare(vector)
+        if self.index is None:
+            self.index = faiss.IndexFlatIP(matrix.shape[1])
+        self.index.add(matrix)
+        self.results.append(result)
+
+        if (
+            self.components is None
+            and self.index.ntotal >= PCA_FIT_SIZE
+            and self.index.d > PCA_COMPONENTS
+        ):
+            self._fit_pca()
+        if (
+            self.enable_quantization
+            and self.index.ntotal >= QUANTIZE_FIT_SIZE
+            and not isinstance(self.index, faiss.IndexScalarQuantizer)
+        ):
+            self._quantize()
+
+        self._unsaved += 1
+        if self._unsaved >= SAVE_EVERY or time.monotonic() - self._saved_at >= SAVE_INTERVAL:
+            self.save()
@@ -0,0 +1,122 @@
+"""
+RAG chain helpers
+=================
+
+Builds the RetrievalQA chain used by the web app and the CLI.
+"""
+
+import functools
+import threading
+from typing import Callable, List, Optional
+
+from langchain.chains import RetrievalQA
+from langchain.globals import set_debug, set_verbose
+from langchain.prompts import PromptTemplate
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.language_models import BaseLLM
+from langchain_core.vectorstores import VectorStore
+
+from config import RETRIEVAL_K
+
+# Keep LangChain's global verbose/debug tracing off on the query path
+set_verbose(False)
+set_debug(False)
+
+MMR_FETCH_K = 10
+ANSWER_CACHE_SIZE = 256
+
+# Instructions come first and never change, so the prompt prefix is
+# byte-identical across questions and Ollama can reuse its KV cache.
+QA_PROMPT = PromptTemplate(
+    template=(
+        "You are DocuScope AI, an assistant that answers questions about a "
+        "user's document. Use only the following pieces of context to answer "
+        "the question at the end. If you don't know the answer, just say that "
+        "you don't know, don't try to make up an answer.\n\n"
+        "{context}\n\n"
+        "Question: {question}\n"
+        "Helpful Answer:"
+    ),
+    input_variables=["context", "question"],
+)
+
+
+def normalize_query(query: str) -> str:
+    """Normalize case and whitespace so trivially different queries match."""
+    return " ".join(query.lower().split())
+
+
+def build_qa_chain(
+    llm: BaseLLM,
+    vectordb: VectorStore,
+    k: int = RETRIEVAL_K,
+    search_type: str = "mmr",
+) -> RetrievalQA:
+    """Create a RetrievalQA chain over ``vectordb``.
+
+    ``k`` is the main generation-latency knob: every retrieved chunk is
+    prefilled into the prompt. MMR re-ranks the ``MMR_FETCH_K`` nearest
+    chunks for diversity, so a small ``k`` still covers the document well.
+    """
+    search_kwargs = {"k": k}
+    if search_type == "mmr":
+        search_kwargs["fetch_k"] = max(MMR_FETCH_K, k)
+
+    return RetrievalQA.from_chain_type(
+        llm=llm,
+        retriever=vectordb.as_retriever(search_type=search_type, search_kwargs=search_kwargs),
+        return_source_documents=True,
+        chain_type_kwargs={"prompt": QA_PROMPT},
+    )
+
+
+class CachedQAChain:
+    """RetrievalQA wrapper that memoizes answers per normalized query.
+
+    One instance is created per (document, retrieval settings), so the
+    cache is effectively keyed on the document hash and the query.
+    """
+
+    def __init__(self, qa_chain: RetrievalQA, maxsize: int = ANSWER_CACHE_SIZE):
+        self.qa_chain = qa_chain
+        self._invoke = functools.lru_cache(maxsize=maxsize)(self._run)
+        # The original query and callbacks are per call and per thread, so
+        # they stay out of the key; only the normalized query is cached on
+        self._local = threading.local()
+
+    def _run(self, key: str) -> dict:
+        query = getattr(self._local, "query", None) or key
+        callbacks = getattr(self._local, "callbacks", None)
+        return self.qa_chain.invoke({"query": query}, config={"callbacks": callbacks})
+
+    def invoke(
+        self,
+        query: str,
+        callbacks: Optional[List[BaseCallbackHandler]] = None,
+    ) -> dict:
+        """Answer ``query``, reusing a cached result for repeated questions.
+
+        ``callbacks`` (e.g. a token streamer) only fire when the answer is
+        actually generated; cache hits return immediately. The chain always
+        sees ``query`` as written; normalization only picks the cache entry.
+        """
+        self._local.query = query
+        self._local.callbacks = callbacks
+        try:
+            result = self._invoke(normalize_query(query))
+        finally:
+            self._local.query = None
+            self._local.callbacks = None
+        return {**result, "query": query}
+
+
+class TokenStreamHandler(BaseCallbackHandler):
+    """Callback that reports the accumulated answer text on every new token."""
+
+    def __init__(self, on_text: Callable[[str], None]):
+        self.on_text = on_text
+        self.text = ""
+
+    def on_llm_new_token(self, token: str, **kwargs) -> None:
+        self.text += token
+        self.on_text(self.text)
@@ -0,0 +1,157 @@
+"""
+Ollama model wrappers
+=====================
+
+Thin subclasses of the LangChain Ollama clients that expose server options
+the pinned ``langchain-community`` release does not forward, and reuse HTTP
+connections across requests.
+"""
+
+import functools
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from langchain_community.embeddings import OllamaEmbeddings
+from langchain_community.llms.ollama import Ollama
+
+from config import EMBED_BATCH_SIZE
+from utils.chain import normalize_query
+
+# One keep-alive connection pool shared by every embedding request, sized for
+# the embedding worker pool in utils.vectorstore. Embedding requests have no
+# side effects, so POSTs are retried (briefly) on dropped connections too.
+_session = requests.Session()
+_session.mount(
+    "http://",
+    HTTPAdapter(
+        pool_connections=16,
+        pool_maxsize=16,
+        max_retries=Retry(total=2, backoff_factor=0.1, allowed_methods=None),
+    ),
+)
+
+# Servers that predate the batched /api/embed endpoint (answered 404)
+_legacy_embed_servers: Set[str] = set()
+
+QUERY_EMBED_CACHE_SIZE = 1024
+
+
+class TunedOllama(Ollama):
+    """Ollama LLM that also forwards ``keep_alive``, ``num_predict`` and ``num_batch``.
+
+    Keeping the model resident lets Ollama reuse the KV cache of a prompt
+    prefix it has already evaluated, instead of reloading the model and
+    prefilling the whole prompt on every question.
+    """
+
+    keep_alive: Optional[Union[int, str]] = None
+    """How long the model stays loaded after a request (e.g. ``"30m"``)."""
+
+    num_predict: Optional[int] = None
+    """Maximum number of tokens to generate per answer."""
+
+    num_batch: Optional[int] = None
+    """Prompt tokens processed per batch; smaller values need less VRAM."""
+
+    @property
+    def _default_params(self) -> Dict[str, Any]:
+        params = super()._default_params
+        if self.keep_alive is not None:
+            params["keep_alive"] = self.keep_alive
+        if self.num_predict is not None:
+            params["options"]["num_predict"] = self.num_predict
+        if self.num_batch is not None:
+            params["options"]["num_batch"] = self.num_batch
+        return params
+
+
+class PooledOllamaEmbeddings(OllamaEmbeddings):
+    """Ollama embeddings that batch texts and reuse pooled HTTP connections.
+
+    The stock client calls ``requests.post`` on ``/api/embeddings`` once per
+    chunk, paying a round trip (and a fresh TCP handshake) every time. This
+    one posts up to ``batch_size`` texts per request to ``/api/embed`` over
+    the shared keep-alive session, and falls back to one text per request on
+    Ollama servers too old to have ``/api/embed``. Query embeddings are
+    memoized, so a question asked again (of any document) costs no request.
+    """
+
+    batch_size: int = EMBED_BATCH_SIZE
+    """Texts per ``/api/embed`` request."""
+
+    request_timeout: float = 60.0
+    """Seconds to wait for each embedding request."""
+
+    def _embed_batch(self, texts: List[str]) -> Optional[List[List[float]]]:
+        """Embed ``texts`` in one request, or return ``None`` if unsupported."""
+        try:
+            res = _session.post(
+                f"{self.base_url}/api/embed",
+                json={"input": texts, **self._default_params},
+                timeout=self.request_timeout,
+            )
+        except requests.exceptions.RequestException as e:
+            raise ValueError(f"Error raised by inference endpoint: {e}")
+
+        # A missing model is also a 404, but its error message names the model
+        if res.status_code == 404 and "model" not in res.text:
+            return None
+        if res.status_code != 200:
+            raise ValueError(
+                "Error raised by inference API HTTP code: %s, %s"
+                % (res.status_code, res.text)
+            )
+        return res.json()["embeddings"]
+
+    def _embed_texts(self, texts: List[str]) -> List[List[float]]:
+        if self.base_url in _legacy_embed_servers:
+            return self._embed(texts)
+
+        embeddings: List[List[float]] = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = self._embed_batch(texts[start:start + self.batch_size])
+            if batch is None:
+                _legacy_embed_servers.add(self.base_url)
+                return embeddings + self._embed(texts[start:])
+            embeddings.extend(batch)
+        return embeddings
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed_texts([f"{self.embed_instruction}{text}" for text in texts])
+
+    def embed_query(self, text: str) -> List[float]:
+        # Questions repeat across documents and sessions; normalize so
+        # trivially different phrasings share one cache entry
+        text = f"{self.query_instruction}{normalize_query(text)}"
+        return list(_embed_cached(self.base_url, self.model, text))
+
+    def _process_emb_response(self, input: str) -> List[float]:
+        try:
+            res = _session.post(
+                f"{self.base_url}/api/embeddings",
+                json={"model": self.model, "prompt": input, **self._default_params},
+                timeout=self.request_timeout,
+            )
+        except requests.exceptions.RequestException as e:
+            raise ValueError(f"Error raised by inference endpoint: {e}")
+
+        if res.status_code != 200:
+            raise ValueError(
+                "Error raised by inference API HTTP code: %s, %s"
+                % (res.status_code, res.text)
+            )
+        try:
+            return res.json()["embedding"]
+        except (KeyError, ValueError) as e:
+            raise ValueError(
+                f"Error raised by inference API: {e}.\nResponse: {res.text}"
+            )
+
+
+@functools.lru_cache(maxsize=QUERY_EMBED_CACHE_SIZE)
+def _embed_cached(base_url: str, model: str, text: str) -> Tuple[float, ...]:
+    """Embed one query text, memoized per server and model across instances."""
+    embedder = PooledOllamaEmbeddings(base_url=base_url, model=model)
+    return tuple(embedder._embed_texts([text])[0])
@@ -0,0 +1,165 @@
+"""
+Document loaders
+================
+
+Turn CSV and PDF files into LangChain ``Document`` objects. Every loader
+accepts either a filesystem path or a binary file-like object, so uploads
+can be parsed straight from memory without a temporary file.
+"""
+
+import functools
+import importlib.util
+import io
+import os
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import BinaryIO, Deque, Iterable, Iterator, Tuple, Union
+
+import pandas as pd
+from langchain.text_splitter import RecursiveCharacterTextSplitter, TextSplitter
+from langchain_core.documents import Document
+from pypdf import PdfReader
+
+Source = Union[str, Path, BinaryIO]
+
+CSV_ROWS_PER_CHUNK = 20
+
+# Below this size, thread start-up costs more than parallel extraction saves
+PDF_PARALLEL_MIN_BYTES = 1_000_000
+# Every worker parses its own reader (xref, object cache), so extra threads
+# cost memory as well as start-up; past a few, extraction gains flatten out
+PDF_MAX_WORKERS = 4
+PDF_WORKERS = min(PDF_MAX_WORKERS, os.cpu_count() or 1)
+
+# mxbai-embed-large truncates inputs past 512 tokens, so keep chunks under it.
+# Chunks are measured in characters: English prose averages about 4 characters
+# per WordPiece token, and budgeting 3 leaves headroom for numbers and symbols.
+CHUNK_TOKENS = 512
+CHUNK_OVERLAP_TOKENS = 64
+CHARS_PER_TOKEN = 3
+
+# pyarrow parses CSVs multi-threaded in C++; fall back to pandas' C parser
+CSV_ENGINE = "pyarrow" if importlib.util.find_spec("pyarrow") else "c"
+
+
+def _extract_pages_parallel(reader: PdfReader, data: bytes) -> Iterator[Tuple[int, str]]:
+    """Extract page texts on a thread pool, yielding them in page order.
+
+    ``PdfReader`` is not thread-safe, so each worker thread uses its own
+    reader over the shared ``data`` (``BytesIO`` does not copy it): the
+    first takes over ``reader`` (already parsed for the page count) and the
+    others open their own. At most ``2 * PDF_WORKERS`` pages are in flight
+    at a time.
+    """
+    local = threading.local()
+    spare = [reader]
+    lock = threading.Lock()
+
+    def extract(page_number: int) -> str:
+        if not hasattr(local, "reader"):
+            with lock:
+                local.reader = spare.pop() if spare else None
+            if local.reader is None:
+                local.reader = PdfReader(io.BytesIO(data), strict=False)
+        return local.reader.pages[page_number].extract_text()
+
+    num_pages = len(reader.pages)
+    pending: Deque[Tuple[int, Future]] = deque()
+    with ThreadPoolExecutor(max_workers=PDF_WORKERS) as executor:
+        for page_number in range(num_pages):
+            pending.append((page_number, executor.submit(extract, page_number)))
+            if len(pending) > 2 * PDF_WORKERS:
+                done_number, future = pending.popleft()
+                yield done_number, future.result()
+        while pending:
+            done_number, future = pending.popleft()
+            yield done_number, future.result()
+
+
+def load_pdf(source: Source, source_name: str) -> Iterator[Document]:
+    """Yield one document per PDF page, in page order.
+
+    pypdf parses from an in-memory copy of the file, so the PDF's bytes are
+    read once and held for the whole extraction. Pages are extracted only as
+    the consumer asks for them, so the embedding pipeline holds a bounded
+    window of page text rather than the whole document's. PDFs over
+    ``PDF_PARALLEL_MIN_BYTES`` are extracted on up to ``PDF_WORKERS``
+    threads, all sharing those bytes. ``strict=False`` tolerates (and skips
+    the extra checks for) minor spec violations common in real-world PDFs.
+    """
+    data = Path(source).read_bytes() if isinstance(source, (str, Path)) else source.read()
+    reader = PdfReader(io.BytesIO(data), strict=False)
+    if len(data) > PDF_PARALLEL_MIN_BYTES and PDF_WORKERS > 1:
+        pages = _extract_pages_parallel(reader, data)
+    else:
+        pages = ((number, page.extract_text()) for number, page in enumerate(reader.pages))
+
+    for page_number, text in pages:
+        yield Document(
+            page_content=text,
+            metadata={"source": source_name, "page": page_number},
+        )
+
+
+def load_csv(
+    source: Source,
+    source_name: str,
+    rows_per_chunk: int = CSV_ROWS_PER_CHUNK,
+) -> Iterator[Document]:
+    """Yield one document per ``rows_per_chunk`` CSV rows.
+
+    Each row is serialized as ``column: value`` lines, with rows separated by
+    a blank line. Serialization runs as vectorized pandas string operations
+    rather than a Python loop per cell, and grouping rows cuts the number of
+    chunks to embed by ``rows_per_chunk``.
+    """
+    df = pd.read_csv(source, dtype=str, keep_default_na=False, engine=CSV_ENGINE)
+    if df.empty:
+        return
+
+    # Build every row's text column by column: one vectorized op per column
+    serialized = None
+    for i, column in enumerate(df.columns):
+        field = f"{str(column).strip()}: " + df.iloc[:, i].str.strip()
+        serialized = field if serialized is None else serialized + "\n" + field
+    rows = serialized.tolist()
+
+    for start in range(0, len(rows), rows_per_chunk):
+        yield Document(
+            page_content="\n\n".join(rows[start:start + rows_per_chunk]),
+            metadata={"source": source_name, "row": start},
+        )
+
+
+@functools.lru_cache(maxsize=None)
+def get_splitter() -> TextSplitter:
+    """Return the shared text splitter.
+
+    Chunk lengths are a character budget of ``CHUNK_TOKENS * CHARS_PER_TOKEN``,
+    an approximation of the embedder's token limit that needs no tokenizer
+    download, so splitting works fully offline. Unusually token-dense text
+    may still run past the limit and be truncated by the embedder.
+    """
+    return RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_TOKENS * CHARS_PER_TOKEN,
+        chunk_overlap=CHUNK_OVERLAP_TOKENS * CHARS_PER_TOKEN,
+    )
+
+
+def split_documents(docs: Iterable[Document]) -> Iterator[Document]:
+    """Lazily split documents into chunks of roughly ``CHUNK_TOKENS`` tokens at most."""
+    splitter = get_splitter()
+    for doc in docs:
+        yield from splitter.split_documents([doc])
+
+
+def load_documents(source: Source, file_name: str) -> Iterator[Document]:
+    """Yield the chunks of a CSV or PDF file, chosen by ``file_name``'s suffix."""
+    suffix = Path(file_name).suffix.lower()
+    if suffix == ".csv":
+        return split_documents(load_csv(source, file_name))
+    if suffix == ".pdf":
+        return split_documents(load_pdf(source, file_name))
+    raise ValueError(f"Unsupported file type: {suffix}")
@@ -0,0 +1,125 @@
+"""
+Query router
+============
+
+Answers pure aggregate questions about a CSV ("What's the average price?",
+"highest rating", "How many reviews are there?") directly with pandas, so
+they take milliseconds instead of a retrieval and LLM round trip. A
+question is only routed when the whole of it matches one of the patterns
+below and names a column of the table; anything with extra conditions
+("How many reviews mention vegan options?") returns ``None`` and goes to
+the QA chain.
+"""
+
+import functools
+import json
+import os
+import re
+from pathlib import Path
+from typing import Optional, Union
+
+import pandas as pd
+
+from utils.loaders import CSV_ENGINE
+
+# Larger tables are left to the QA chain rather than held in memory
+TABLE_MAX_BYTES = 16 << 20
+
+# Optional lead-in such as "what's the" or "show me the"
+_PREFIX = r"(?:(?:what is|what's|what was|show me|give me|find) )?(?:the )?"
+_COLUMN = r"(?P<column>[\w ]+?)"
+
+AGGREGATES = (
+    ("count", re.compile(rf"^how many {_COLUMN}(?: are there)?(?: in total| total)?$")),
+    ("mean", re.compile(rf"^{_PREFIX}(?:average|mean) (?:of )?{_COLUMN}$")),
+    ("max", re.compile(rf"^{_PREFIX}(?:highest|maximum|max|largest) (?:of )?{_COLUMN}$")),
+    ("min", re.compile(rf"^{_PREFIX}(?:lowest|minimum|min|smallest) (?:of )?{_COLUMN}$")),
+)
+
+# Counting these counts the table's rows rather than a column's values
+ROW_WORDS = {"rows", "records", "entries"}
+
+
+@functools.lru_cache(maxsize=8)
+def _read_table(path: str, mtime_ns: int, size: int) -> pd.DataFrame:
+    return pd.read_csv(path, engine=CSV_ENGINE)
+
+
+def load_table(path: Union[str, Path]) -> Optional[pd.DataFrame]:
+    """Return the parsed CSV at ``path``, cached until the file changes.
+
+    Returns ``None`` for files over ``TABLE_MAX_BYTES``.
+    """
+    stat = os.stat(path)
+    if stat.st_size > TABLE_MAX_BYTES:
+        return None
+    return _read_table(str(path), stat.st_mtime_ns, stat.st_size)
+
+
+def _match(query: str):
+    """Return ``(operation, column words)`` if the whole query is an aggregate."""
+    text = " ".join(query.lower().replace("_", " ").split()).rstrip("?.! ")
+    for operation, pattern in AGGREGATES:
+        match = pattern.match(text)
+        if match:
+            return operation, match.group("column")
+    return None
+
+
+def _named_column(name: str, df: pd.DataFrame) -> Optional[str]:
+    """Return the column ``name`` refers to (plurals allowed), if any."""
+    for column in df.columns:
+        column_name = " ".join(str(column).lower().replace("_", " ").split())
+        if name in (column_name, f"{column_name}s", f"{column_name}es"):
+            return column
+    return None
+
+
+def _scalar(value):
+    return value.item() if hasattr(value, "item") else value
+
+
+def _result(query: str, answer: dict) -> dict:
+    return {"query": query, "result": json.dumps(answer), "source_documents": []}
+
+
+def answer_aggregate(query: str, path: Union[str, Path]) -> Optional[dict]:
+    """Answer an aggregate question about the CSV at ``path`` with pandas.
+
+    Returns a result shaped like the QA chain's (``result`` holds a JSON
+    string), or ``None`` when the query is not a recognized aggregate over
+    a column of the table.
+    """
+    matched = _match(query)
+    if matched is None:
+        return None
+    operation, name = matched
+
+    df = load_table(path)
+    if df is None:
+        return None
+
+    if operation == "count" and name in ROW_WORDS:
+        return _result(query, {"operation": "count", "column": None, "value": len(df)})
+
+    column = _named_column(name, df)
+    if column is None:
+        return None
+    if operation == "count":
+        value = int(df[column].count())
+        return _result(query, {"operation": "count", "column": column, "value": value})
+
+    values = pd.to_numeric(df[column], errors="coerce")
+    if values.isna().all():
+        return None
+    if operation == "mean":
+        answer = {"operation": "mean", "column": column, "value": float(values.mean())}
+    else:
+        index = values.idxmax() if operation == "max" else values.idxmin()
+        answer = {
+            "operation": operation,
+            "column": column,
+            "value": _scalar(values[index]),
+            "row": json.loads(df.loc[index].to_json()),
+        }
+    return _result(query, answer)
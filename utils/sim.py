@@ -0,0 +1,106 @@
+"""
+Similarity kernels
+==================
+
+Small vector-similarity routines used on the query path. They are compiled
+with Numba when it is installed and fall back to NumPy otherwise.
+"""
+
+import hashlib
+
+import numpy as np
+
+try:
+    from numba import njit, prange
+except ImportError:  # pragma: no cover - optional speedup
+    njit = None
+
+DUPLICATE_THRESHOLD = 0.98
+SNIPPET_KEY_CHARS = 256
+
+if njit is not None:
+
+    @njit(fastmath=True, cache=True)
+    def _normalize_1d(vector):
+        total = np.float32(0.0)
+        for t in range(vector.shape[0]):
+            total += vector[t] * vector[t]
+        norm = np.sqrt(total)
+        out = np.zeros_like(vector)
+        if norm > 0:
+            for t in range(vector.shape[0]):
+                out[t] = vector[t] / norm
+        return out
+
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _cosine_similarity_matrix(vectors):
+        n, dim = vectors.shape
+        norms = np.empty(n, dtype=np.float32)
+        for i in prange(n):
+            total = np.float32(0.0)
+            for t in range(dim):
+                total += vectors[i, t] * vectors[i, t]
+            norms[i] = np.sqrt(total)
+
+        sims = np.zeros((n, n), dtype=np.float32)
+        for i in prange(n):
+            for j in range(n):
+                if norms[i] > 0 and norms[j] > 0:
+                    dot = np.float32(0.0)
+                    for t in range(dim):
+                        dot += vectors[i, t] * vectors[j, t]
+                    sims[i, j] = dot / (norms[i] * norms[j])
+        return sims
+
+else:
+
+    def _normalize_1d(vector):
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else np.zeros_like(vector)
+
+    def _cosine_similarity_matrix(vectors):
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        normed = np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+        return normed @ normed.T
+
+
+def normalize_1d(vector) -> np.ndarray:
+    """Return ``vector`` scaled to unit length as float32 (zeros stay zero)."""
+    return _normalize_1d(np.ascontiguousarray(vector, dtype=np.float32))
+
+
+def cosine_similarity_matrix(vectors: np.ndarray) -> np.ndarray:
+    """Return the pairwise cosine similarities of the rows of ``vectors``."""
+    return _cosine_similarity_matrix(np.ascontiguousarray(vectors, dtype=np.float32))
+
+
+def near_duplicate_mask(vectors: np.ndarray, threshold: float = DUPLICATE_THRESHOLD) -> np.ndarray:
+    """Flag which rows to keep, dropping rows nearly identical to an earlier one.
+
+    Rows are visited in order, so the first (highest-ranked) of a group of
+    near-duplicates is the one that survives.
+    """
+    sims = cosine_similarity_matrix(vectors)
+    keep = np.ones(len(sims), dtype=np.bool_)
+    for i in range(len(sims)):
+        for j in range(i):
+            if keep[j] and sims[i, j] > threshold:
+                keep[i] = False
+                break
+    return keep
+
+
+def warmup(dim: int = 1024):
+    """Compile (or load from Numba's cache) the kernels before the first query."""
+    vectors = np.ones((2, dim), dtype=np.float32)
+    normalize_1d(vectors[0])
+    cosine_similarity_matrix(vectors)
+
+
+def snippet_key(text: str, prefix_chars: int = SNIPPET_KEY_CHARS) -> bytes:
+    """Return a compact dedup key for a text from its leading characters.
+
+    Hashing a fixed-size prefix keeps exact-duplicate checks O(1) in the
+    text length and stores 8 bytes per entry instead of the whole text.
+    """
+    return hashlib.blake2b(text[:prefix_chars].encode(), digest_size=8).digest()
@@ -0,0 +1,305 @@
+"""
+Vector store helpers
+====================
+
+Builds the per-document vector store and persists it on disk, keyed by the
+document's content hash and the embedding model, so a document that has
+already been embedded is never embedded again.
+
+Vectors are L2-normalized and searched under inner-product metric, so
+searches rank by cosine similarity. Typical documents use an exact flat
+index, which is fastest to build and query at that size; documents of more
+than ``HNSW_MIN_VECTORS`` chunks are moved to an HNSW graph so search time
+grows roughly logarithmically instead of linearly.
+"""
+
+import hashlib
+import os
+import queue
+import re
+import shutil
+import threading
+import uuid
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Deque, Iterable, Iterator, List, Optional, Tuple, Union
+
+import faiss
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import DistanceStrategy
+
+from config import EMBED_BATCH_SIZE, EMBED_PARALLEL_LIMIT
+
+CACHE_DIR = Path(".cache")
+
+# Flat (exact) search beats HNSW below this many vectors
+HNSW_MIN_VECTORS = 10_000
+ADD_BATCH_SIZE = 1024
+
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 64
+HNSW_EF_SEARCH = 64
+
+_SENTINEL = object()
+
+
+def file_sha256(data: bytes) -> str:
+    """Return the hex SHA-256 digest of a document's raw bytes."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def path_sha256(path: Union[str, Path], block_size: int = 1 << 20) -> str:
+    """Return the hex SHA-256 digest of a file, read in fixed-size blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def index_dir(file_hash: str, embedding_model: str, store: str = "faiss") -> Path:
+    """Return the on-disk location of a document's index for a given model."""
+    model_slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", embedding_model)
+    return CACHE_DIR / store / f"{file_hash}-{model_slug}"
+
+
+def _embed_batch(embedding: Embeddings, batch: List[Document]):
+    texts = [doc.page_content for doc in batch]
+    return batch, texts, embedding.embed_documents(texts)
+
+
+def embed_streaming(
+    embedding: Embeddings,
+    docs: Iterable[Document],
+    batch_size: int = EMBED_BATCH_SIZE,
+    max_workers: int = EMBED_PARALLEL_LIMIT,
+) -> Iterator[Tuple[List[Document], List[str], List[List[float]]]]:
+    """Embed documents as they are produced, yielding batches in order.
+
+    A producer thread drains ``docs`` (typically a lazy loader) into a
+    bounded queue while a worker pool embeds full batches, so parsing
+    overlaps with embedding. Each item is ``(documents, texts, vectors)``.
+
+    At most ``max_workers`` embedding requests run at once. The producer
+    reads at most one batch ahead and at most ``2 * max_workers`` batches
+    are in flight, so peak memory depends on ``batch_size`` and
+    ``max_workers``, never on the document's length.
+    """
+    buffer: "queue.Queue" = queue.Queue(maxsize=batch_size)
+    errors: List[BaseException] = []
+    # Set when the consumer stops early (an embedding error, or the caller
+    # abandoning the generator) so the producer never blocks forever
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for doc in docs:
+                if not put(doc):
+                    break
+        except BaseException as e:
+            errors.append(e)
+        finally:
+            put(_SENTINEL)
+            # Release the loader's resources (open files, thread pools)
+            close = getattr(docs, "close", None)
+            if close is not None:
+                close()
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+
+    pending: Deque[Future] = deque()
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            try:
+                batch: List[Document] = []
+                while True:
+                    doc = buffer.get()
+                    if doc is not _SENTINEL:
+                        batch.append(doc)
+                    if batch and (len(batch) == batch_size or doc is _SENTINEL):
+                        pending.append(executor.submit(_embed_batch, embedding, batch))
+                        batch = []
+                    # Keep a bounded number of batches in flight, handing finished
+                    # ones back in order so memory stays proportional to the pipeline.
+                    while pending and (
+                        pending[0].done()
+                        or len(pending) > 2 * max_workers
+                        or doc is _SENTINEL
+                    ):
+                        yield pending.popleft().result()
+                    if doc is _SENTINEL:
+                        break
+            finally:
+                stop.set()
+                for future in pending:
+                    future.cancel()
+    finally:
+        stop.set()
+        # Drop anything the producer queued so it can observe ``stop`` and exit
+        while True:
+            try:
+                buffer.get_nowait()
+            except queue.Empty:
+                break
+        producer.join()
+
+    if errors:
+        raise errors[0]
+
+
+def _new_hnsw_index(dim: int) -> faiss.Index:
+    index = faiss.IndexHNSWFlat(dim, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+    index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+    index.hnsw.efSearch = HNSW_EF_SEARCH
+    return index
+
+
+def _to_hnsw(flat: faiss.Index) -> faiss.Index:
+    """Copy a flat index's vectors, in order, into a new HNSW index."""
+    index = _new_hnsw_index(flat.d)
+    for start in range(0, flat.ntotal, ADD_BATCH_SIZE):
+        count = min(ADD_BATCH_SIZE, flat.ntotal - start)
+        index.add(flat.reconstruct_n(start, count))
+    return index
+
+
+def build_faiss(embedding: Embeddings, docs: Iterable[Document]) -> Optional[FAISS]:
+    """Embed ``docs`` into a new FAISS store.
+
+    Embedded batches are buffered and added ``ADD_BATCH_SIZE`` vectors at a
+    time to amortize per-call overhead. Returns ``None`` when ``docs`` is
+    empty.
+    """
+    vectordb = None
+    pending_texts: List[str] = []
+    pending_vectors: List[np.ndarray] = []
+    pending_metadatas: List[dict] = []
+    pending_ids: List[str] = []
+
+    def flush():
+        nonlocal vectordb
+        matrix = np.vstack(pending_vectors)
+        if vectordb is None:
+            vectordb = FAISS(
+                embedding,
+                faiss.IndexFlatIP(matrix.shape[1]),
+                InMemoryDocstore(),
+                {},
+                distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT,
+            )
+        vectordb.add_embeddings(
+            zip(pending_texts, matrix),
+            metadatas=pending_metadatas,
+            ids=pending_ids,
+        )
+        for pending in (pending_texts, pending_vectors, pending_metadatas, pending_ids):
+            pending.clear()
+
+    # Hand the embedder whole request-sized batches when it batches requests
+    batch_size = getattr(embedding, "batch_size", EMBED_BATCH_SIZE)
+    for batch, texts, vectors in embed_streaming(embedding, docs, batch_size=batch_size):
+        matrix = np.asarray(vectors, dtype=np.float32)
+        faiss.normalize_L2(matrix)
+
+        # Record each chunk's id in its metadata so retrieved sources can
+        # look their vectors back up (see source_vectors).
+        ids = [str(uuid.uuid4()) for _ in batch]
+        pending_texts.extend(texts)
+        pending_vectors.append(matrix)
+        pending_metadatas.extend({**doc.metadata, "chunk_id": id_} for doc, id_ in zip(batch, ids))
+        pending_ids.extend(ids)
+        if len(pending_ids) >= ADD_BATCH_SIZE:
+            flush()
+
+    if pending_ids:
+        flush()
+    if vectordb is not None and vectordb.index.ntotal > HNSW_MIN_VECTORS:
+        vectordb.index = _to_hnsw(vectordb.index)
+    return vectordb
+
+
+def source_vectors(vectordb: FAISS, docs: List[Document]) -> Optional[np.ndarray]:
+    """Fetch the stored embeddings of retrieved documents, in order.
+
+    Returns ``None`` when any document lacks a stored vector.
+    """
+    ids = [doc.metadata.get("chunk_id") for doc in docs]
+    if not docs or not all(ids):
+        return None
+    positions = {id_: pos for pos, id_ in vectordb.index_to_docstore_id.items()}
+    if not all(id_ in positions for id_ in ids):
+        return None
+    return np.vstack([vectordb.index.reconstruct(positions[id_]) for id_ in ids])
+
+
+def _is_saved(directory: Path) -> bool:
+    return (directory / "index.faiss").exists() and (directory / "index.pkl").exists()
+
+
+def save_faiss(vectordb: FAISS, persist_directory: Path):
+    """Persist ``vectordb`` so the directory only ever appears complete.
+
+    The store is written to a temporary sibling and renamed into place, so
+    an interrupted save never leaves an ``index.faiss`` without its
+    ``index.pkl``.
+    """
+    tmp_directory = persist_directory.with_name(
+        f"{persist_directory.name}.tmp-{uuid.uuid4().hex}"
+    )
+    vectordb.save_local(str(tmp_directory))
+    try:
+        if persist_directory.exists() and not _is_saved(persist_directory):
+            # Left behind by a save from before writes were atomic
+            shutil.rmtree(persist_directory)
+        os.replace(tmp_directory, persist_directory)
+    except OSError:
+        shutil.rmtree(tmp_directory, ignore_errors=True)
+        # Another process may have saved the same index first
+        if not _is_saved(persist_directory):
+            raise
+
+
+def load_or_build_index(
+    file_hash: str,
+    embedding: Embeddings,
+    load_docs: Callable[[], Iterable[Document]],
+) -> Optional[FAISS]:
+    """Open the persisted FAISS index for a document, building it if missing.
+
+    ``load_docs`` is only called when nothing has been persisted yet, so
+    cache hits skip both parsing and embedding. It may return a lazy
+    iterator; documents are embedded as they arrive. Returns ``None`` when
+    the document has no content.
+    """
+    persist_directory = index_dir(file_hash, embedding.model)
+
+    if _is_saved(persist_directory):
+        vectordb = FAISS.load_local(
+            str(persist_directory),
+            embedding,
+            distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT,
+        )
+        if hasattr(vectordb.index, "hnsw"):
+            vectordb.index.hnsw.efSearch = HNSW_EF_SEARCH
+        return vectordb
+
+    vectordb = build_faiss(embedding, load_docs())
+    if vectordb is None:
+        return None
+    save_faiss(vectordb, persist_directory)
+    return vectordb